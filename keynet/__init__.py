@@ -1,3 +1,7 @@
+import logging
+
 from .main import KeyNet
 
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
 __all__ = ["KeyNet"]
@@ -1,8 +1,15 @@
 # main.py
+import bisect
+import collections
+import heapq
+import logging
 import threading
 import time
 import platform
-from typing import Callable, Set, List, Tuple, Dict, Any, Optional
+import re
+import select
+import socket
+from typing import Callable, Deque, Set, List, Tuple, Dict, Any, Optional
 import psutil
 from pynput import keyboard, mouse
 from pynput.keyboard import Key, KeyCode
@@ -10,13 +17,79 @@ import subprocess
 
 if platform.system() == "Windows":
     import pythoncom
-    from ctypes import POINTER, cast
+    from ctypes import POINTER, byref, c_ulong, cast, windll
     from comtypes import CLSCTX_ALL
     from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
 
+logger = logging.getLogger(__name__)
+
+# All timestamps are integer nanoseconds from the monotonic clock.
+_mono = time.monotonic_ns
+
+_KEYBOARD_EVENTS = ("key_press", "key_release", "key_combo")
+_MOUSE_EVENTS = ("mouse_click", "mouse_move", "mouse_scroll")
+_SYSTEM_EVENTS = ("battery", "network", "volume_threshold", "volume_mute")
+
+# Polled sensors, the events each one feeds, and their default poll
+# interval in seconds (overridable per listener with ``interval_s``).
+_SENSOR_EVENTS = {
+    "battery": ("battery",),
+    "network": ("network",),
+    "volume": ("volume_threshold", "volume_mute"),
+}
+_POLL_INTERVALS = {"battery": 30.0, "network": 5.0, "volume": 0.2}
+# Volume default when each poll forks osascript/amixer (no helper running).
+_VOLUME_FORK_INTERVAL = 1.0
+# A failing sensor's interval doubles per consecutive failure, up to 2**6 times.
+_MAX_BACKOFF_SHIFT = 6
+# Identical errors from one source are logged at most once per minute.
+_LOG_REPEAT_NS = 60 * 1_000_000_000
+
+# rtnetlink multicast groups (linux/rtnetlink.h)
+_RTMGRP_LINK = 0x1
+_RTMGRP_IPV4_IFADDR = 0x10
+_RTMGRP_IPV4_ROUTE = 0x40
+_RTMGRP_IPV6_IFADDR = 0x100
+_RTMGRP_IPV6_ROUTE = 0x400
+
+# /proc/net/ipv6_route flag for unreachable/prohibit routes (linux/ipv6_route.h)
+_RTF_REJECT = 0x0200
+_IPV6_ANY = b"0" * 32
+
+# Any public address works: only the existence of a route to it matters.
+_ROUTE_PROBE_ADDR = int.from_bytes(socket.inet_aton("8.8.8.8"), "little")
+
+# How long to wait before (re)starting a volume helper that failed or exited.
+_VOLUME_HELPER_RETRY_NS = 5 * 1_000_000_000
+
+_PACTL_VOLUME_RE = re.compile(r"(\d+)%")
+# The [on|off] switch is absent on controls without a playback switch.
+_AMIXER_RE = re.compile(rb"\[(\d+)%\](?:.*?\[(on|off)\])?")
+
+# Run by a single long-lived osascript child; it writes "<volume>,<muted>"
+# to stderr (via `log`) whenever the output settings change.
+_OSA_VOLUME_WATCH = """
+set lastState to ""
+repeat
+    set s to get volume settings
+    set curState to ((output volume of s) as text) & "," & ((output muted of s) as text)
+    if curState is not lastState then
+        log curState
+        set lastState to curState
+    end if
+    delay 0.2
+end repeat
+"""
+
 
 class KeyNet:
-    """Cross-platform system event monitor (keyboard, mouse, battery, network, volume)."""
+    """Cross-platform system event monitor (keyboard, mouse, battery, network, volume).
+
+    start() returns immediately; all listening happens on background threads.
+    To keep a script alive until stop() is called, use join() rather than a
+    ``while kn.running: time.sleep(...)`` loop, which keeps waking up and
+    competing for the GIL with the input listeners.
+    """
 
     def __init__(self):
         self.listeners: Dict[str, List[Tuple[Callable, Dict[str, Any]]]] = {
@@ -31,16 +104,98 @@ class KeyNet:
             "battery": [],
             "network": []
         }
+        # Flat dispatch tables read by the listener and dispatch threads; they
+        # mirror self.listeners but drop the per-event kwargs unpacking. They
+        # are copy-on-write tuples: on() builds a new tuple and swaps it in
+        # with a single (GIL-atomic) assignment, so readers never need a lock
+        # and never see a table change mid-iteration.
+        self._press_cbs: Tuple[Callable, ...] = ()
+        self._release_cbs: Tuple[Callable, ...] = ()
+        # key_combo entries as (cb, key_mask, combo); see _key_bits below.
+        self._combo_cbs: Tuple[Tuple[Callable, int, Tuple[str, ...]], ...] = ()
+        self._click_cbs: Tuple[Callable, ...] = ()
+        self._move_cbs: Tuple[Callable, ...] = ()
+        self._scroll_cbs: Tuple[Callable, ...] = ()
+        self._dispatch: Dict[str, str] = {
+            "key_press": "_press_cbs",
+            "key_release": "_release_cbs",
+            "mouse_click": "_click_cbs",
+            "mouse_move": "_move_cbs",
+            "mouse_scroll": "_scroll_cbs",
+        }
+        # Rate-limited registrations, kept apart so unthrottled callbacks
+        # stay on the plain loops. Entries are mutable so the dispatcher can
+        # update the last-fired state in place:
+        #   move:            [cb, min_interval_ns, min_delta_px, last_ns, last_x, last_y]
+        #   press / scroll:  [cb, coalesce_ns, last_ns]
+        self._move_throttled: Tuple[list, ...] = ()
+        self._press_coalesced: Tuple[list, ...] = ()
+        self._scroll_coalesced: Tuple[list, ...] = ()
+        # volume_threshold registrations: (sorted thresholds, matching
+        # [threshold, cb, last_state] entries), swapped as one pair so the
+        # bisect keys and entries always line up.
+        self._vol_thresholds: Tuple[Tuple[float, ...], Tuple[list, ...]] = ((), ())
+        # Only touched from the keyboard listener thread; single set
+        # operations are atomic under the GIL, so no lock is taken.
         self.current_keys: Set[str] = set()
+        # Every key named in a registered combo gets one bit. The keyboard
+        # listener keeps the bits of the combo keys currently down, so a combo
+        # check is a single integer AND + compare instead of a set subset
+        # test. Copy-on-write like the tables above: on() swaps in a new dict.
+        self._key_bits: Dict[str, int] = {}
+        self._key_str_cache: Dict[Any, str] = {}
+        # Input events queued by the pynput threads for the dispatch thread as
+        # (handler, ts_ns, args); on overflow the oldest events are dropped.
+        self._event_q: Deque[Tuple[Callable, int, Tuple[Any, ...]]] = collections.deque(maxlen=4096)
+        self._event_cv = threading.Condition()
         self.running: bool = False
-        self._key_lock = threading.Lock()
         self._keyboard_listener: Optional[keyboard.Listener] = None
         self._mouse_listener: Optional[mouse.Listener] = None
+        self._monitor_thread: Optional[threading.Thread] = None
+        self._dispatcher_thread: Optional[threading.Thread] = None
+        # Stop token for the current run: start() creates a fresh Event and
+        # stop() sets it. Threads capture the Event of the run that started
+        # them and exit on it, so a quick stop()/start() can't revive them.
+        self._stop_evt = threading.Event()
+        self._stop_evt.set()
+        # Set by on() and stop() to wake the monitor thread; replaced per run.
+        self._monitor_wake = threading.Event()
+        # Last reported sensor states, reset by start()
+        self._last_battery: Optional[Tuple[float, bool]] = None
+        self._last_net: Optional[bool] = None
+        self._last_vol: Optional[int] = None
+        self._last_mute_state: Optional[bool] = None
+        self._sensor_failures: Dict[str, int] = dict.fromkeys(_SENSOR_EVENTS, 0)
+        # source -> (suppressed count, last emit ns, last message)
+        self._log_state: Dict[str, Tuple[int, int, str]] = {}
+        self._netlink: Optional[socket.socket] = None
+        self._netlink_thread: Optional[threading.Thread] = None
+        # Closing this end of a socketpair wakes the netlink watcher on stop()
+        self._netlink_wake: Optional[socket.socket] = None
+        self._volume_proc: Optional[subprocess.Popen] = None
+        self._volume_cache: Tuple[Optional[int], Optional[bool]] = (None, None)
+        self._volume_helper_retry_at: int = 0
+        # IAudioEndpointVolume, activated once on the monitor thread (Windows only)
+        self._win_volume: Any = None
         self.os = platform.system().lower()
+        self._get_system_volume = getattr(self, f"_get_volume_{self.os}", self._get_system_volume)
 
     # -------------------- Input Handling --------------------
 
     def _key_to_string(self, key: Key | KeyCode) -> str:
+        # Key members are enum singletons that live for the whole process, so
+        # their id() is a stable cache key. KeyCode objects are created per
+        # event, so they are keyed by value instead.
+        if isinstance(key, KeyCode):
+            ident: Any = (key.char, key.vk)
+        else:
+            ident = id(key)
+        key_str = self._key_str_cache.get(ident)
+        if key_str is None:
+            key_str = self._key_str_cache[ident] = self._format_key(key)
+        return key_str
+
+    def _format_key(self, key: Key | KeyCode) -> str:
         if isinstance(key, KeyCode) and key.char:
             return key.char.lower()
         elif isinstance(key, Key):
@@ -48,50 +203,215 @@ class KeyNet:
         return str(key).strip("'")
 
     def on(self, event_type: str, callback: Callable, **kwargs) -> None:
+        """Register a callback for an event type.
+
+        Input callbacks run on a dispatch thread; battery, network and volume
+        callbacks all run on a single monitor thread.
+
+        Optional rate limits:
+            mouse_move: ``min_interval_ms`` and/or ``min_delta_px`` -- the callback
+                fires once either the interval has elapsed or the pointer has moved
+                that many pixels (Manhattan distance) since it last fired.
+            key_press, mouse_scroll: ``coalesce_ms`` -- the callback fires at most
+                once per window; events inside the window are dropped.
+            battery, network, volume_threshold, volume_mute: ``interval_s`` -- poll
+                interval for that sensor, must be positive (defaults: battery 30s,
+                network 5s, volume 0.2s, or 1s when each poll has to spawn a process).
+        """
         if event_type not in self.listeners:
             raise ValueError(f"Unknown event type: {event_type}")
+        if "interval_s" in kwargs and not kwargs["interval_s"] > 0:
+            raise ValueError(f"interval_s must be positive, got {kwargs['interval_s']!r}")
         self.listeners[event_type].append((callback, kwargs))
+        if event_type == "key_combo":
+            combo = kwargs.get("combo", [])
+            if combo:
+                self._combo_cbs += ((callback, self._combo_mask(combo), tuple(combo)),)
+        elif event_type == "volume_threshold":
+            threshold = kwargs.get("threshold", 50)
+            keys, entries = self._vol_thresholds
+            i = bisect.bisect_right(keys, threshold)
+            self._vol_thresholds = (
+                keys[:i] + (threshold,) + keys[i:],
+                entries[:i] + ([threshold, callback, None],) + entries[i:],
+            )
+            # Force one full pass so the new entry gets its initial state.
+            self._last_vol = None
+        elif event_type == "mouse_move" and (kwargs.get("min_interval_ms") or kwargs.get("min_delta_px")):
+            interval_ns = int(kwargs.get("min_interval_ms", 0) * 1_000_000)
+            self._move_throttled += (
+                [callback, interval_ns, kwargs.get("min_delta_px", 0), 0, None, None],
+            )
+        elif event_type == "key_press" and kwargs.get("coalesce_ms"):
+            self._press_coalesced += ([callback, int(kwargs["coalesce_ms"] * 1_000_000), 0],)
+        elif event_type == "mouse_scroll" and kwargs.get("coalesce_ms"):
+            self._scroll_coalesced += ([callback, int(kwargs["coalesce_ms"] * 1_000_000), 0],)
+        elif event_type in self._dispatch:
+            attr = self._dispatch[event_type]
+            setattr(self, attr, getattr(self, attr) + (callback,))
+        if self.running:
+            if event_type in _KEYBOARD_EVENTS and self._keyboard_listener is None:
+                self._start_keyboard_listener()
+            elif event_type in _MOUSE_EVENTS and self._mouse_listener is None:
+                self._start_mouse_listener()
+            elif event_type in _SYSTEM_EVENTS:
+                self._start_system_monitors()
 
-    def _check_combo(self, combo: List[str]) -> bool:
-        with self._key_lock:
-            return set(combo).issubset(self.current_keys)
+    def _combo_mask(self, combo: List[str]) -> int:
+        """Bitmask for ``combo``, assigning bits to keys not seen before."""
+        bits = dict(self._key_bits)
+        mask = 0
+        for key_str in combo:
+            bit = bits.get(key_str)
+            if bit is None:
+                bit = bits[key_str] = 1 << len(bits)
+            mask |= bit
+        if len(bits) != len(self._key_bits):
+            self._key_bits = bits
+        return mask
 
     # -------------------- Keyboard & Mouse --------------------
 
+    def _post_event(self, handler: Callable, ts: int, *args: Any) -> None:
+        """Queue ``handler(ts, *args)`` for the dispatch thread (called from listener threads)."""
+        with self._event_cv:
+            self._event_q.append((handler, ts, args))
+            self._event_cv.notify()
+
+    def _start_dispatcher(self) -> None:
+        """Run user callbacks off the pynput threads so slow handlers can't stall input."""
+        q = self._event_q
+        cv = self._event_cv
+        stop_evt = self._stop_evt
+
+        def dispatch():
+            while not stop_evt.is_set():
+                with cv:
+                    while not q and not stop_evt.is_set():
+                        cv.wait()
+                while q and not stop_evt.is_set():
+                    handler, ts, args = q.popleft()
+                    try:
+                        handler(ts, *args)
+                    except Exception:
+                        # Not throttled: every failure in user code is reported
+                        # with its traceback.
+                        logger.exception("Unhandled exception in event callback")
+
+        self._dispatcher_thread = threading.Thread(target=dispatch, daemon=True)
+        self._dispatcher_thread.start()
+
     def _start_keyboard_listener(self) -> None:
+        # Tables are re-read from self on every event, so registrations made
+        # after start() take effect; each read is one tuple snapshot.
+        current_keys = self.current_keys
+        post = self._post_event
+        # Listener-thread state: the _key_bits table in use and the mask of
+        # combo keys held down. When on() swaps in a new table the mask is
+        # rebuilt from current_keys, so keys already held get their new bits.
+        bits: Optional[Dict[str, int]] = None
+        pressed = 0
+
+        def sync_bits():
+            nonlocal bits, pressed
+            bits = self._key_bits
+            pressed = 0
+            for held in current_keys:
+                pressed |= bits.get(held, 0)
+
+        # Dispatch handlers receive the event's listener-side timestamp, so
+        # rate limits are measured against when input happened, not when
+        # the dispatch thread got to it.
+        def dispatch_press(ts, key_str):
+            for cb in self._press_cbs:
+                cb(key_str)
+            for entry in self._press_coalesced:
+                if ts - entry[2] >= entry[1]:
+                    entry[2] = ts
+                    entry[0](key_str)
+
+        def dispatch_release(ts, key_str):
+            for cb in self._release_cbs:
+                cb(key_str)
+
+        def dispatch_combo(ts, cb, combo):
+            cb(combo)
+
+        # The listener thread only tracks key state, matches combos against
+        # it, and queues the callbacks.
         def on_press(key):
+            nonlocal pressed
+            ts = _mono()
             key_str = self._key_to_string(key)
-            with self._key_lock:
-                self.current_keys.add(key_str)
-            for cb, _ in self.listeners["key_press"]:
-                cb(key_str)
-            for cb, params in self.listeners["key_combo"]:
-                combo = params.get("combo", [])
-                if combo and self._check_combo(combo):
-                    cb(combo)
+            current_keys.add(key_str)
+            if self._press_cbs or self._press_coalesced:
+                post(dispatch_press, ts, key_str)
+            combo_cbs = self._combo_cbs
+            if combo_cbs:
+                if bits is not self._key_bits:
+                    sync_bits()
+                else:
+                    pressed |= bits.get(key_str, 0)
+                for cb, mask, combo_tup in combo_cbs:
+                    if pressed & mask == mask:
+                        post(dispatch_combo, ts, cb, combo_tup)
 
         def on_release(key):
+            nonlocal pressed
+            ts = _mono()
             key_str = self._key_to_string(key)
-            with self._key_lock:
-                self.current_keys.discard(key_str)
-            for cb, _ in self.listeners["key_release"]:
-                cb(key_str)
+            current_keys.discard(key_str)
+            if bits is not self._key_bits:
+                sync_bits()
+            else:
+                pressed &= ~bits.get(key_str, 0)
+            if self._release_cbs:
+                post(dispatch_release, ts, key_str)
 
         self._keyboard_listener = keyboard.Listener(on_press=on_press, on_release=on_release)
         self._keyboard_listener.start()
 
     def _start_mouse_listener(self) -> None:
-        def on_click(x, y, button, pressed):
-            for cb, _ in self.listeners["mouse_click"]:
+        post = self._post_event
+
+        def dispatch_click(ts, x, y, button, pressed):
+            for cb in self._click_cbs:
                 cb(x, y, button, pressed)
 
-        def on_move(x, y):
-            for cb, _ in self.listeners["mouse_move"]:
+        def dispatch_move(ts, x, y):
+            for cb in self._move_cbs:
                 cb(x, y)
+            for entry in self._move_throttled:
+                cb, interval_ns, delta_px, last_ns, last_x, last_y = entry
+                if (
+                    last_x is None
+                    or (interval_ns and ts - last_ns >= interval_ns)
+                    or (delta_px and abs(x - last_x) + abs(y - last_y) >= delta_px)
+                ):
+                    entry[3] = ts
+                    entry[4] = x
+                    entry[5] = y
+                    cb(x, y)
 
-        def on_scroll(x, y, dx, dy):
-            for cb, _ in self.listeners["mouse_scroll"]:
+        def dispatch_scroll(ts, x, y, dx, dy):
+            for cb in self._scroll_cbs:
                 cb(x, y, dx, dy)
+            for entry in self._scroll_coalesced:
+                if ts - entry[2] >= entry[1]:
+                    entry[2] = ts
+                    entry[0](x, y, dx, dy)
+
+        def on_click(x, y, button, pressed):
+            if self._click_cbs:
+                post(dispatch_click, _mono(), x, y, button, pressed)
+
+        def on_move(x, y):
+            if self._move_cbs or self._move_throttled:
+                post(dispatch_move, _mono(), x, y)
+
+        def on_scroll(x, y, dx, dy):
+            if self._scroll_cbs or self._scroll_coalesced:
+                post(dispatch_scroll, _mono(), x, y, dx, dy)
 
         self._mouse_listener = mouse.Listener(on_click=on_click, on_move=on_move, on_scroll=on_scroll)
         self._mouse_listener.start()
@@ -99,116 +419,491 @@ class KeyNet:
     # -------------------- System Monitors --------------------
 
     def _start_system_monitors(self) -> None:
+        """Start whichever system watchers the registered listeners need."""
+        if self.listeners["network"] and self._netlink is None and self.os == "linux":
+            self._start_network_watcher()
+        if self.listeners["volume_threshold"] or self.listeners["volume_mute"]:
+            self._start_volume_helper()
+
+        if not any(self._sensor_wanted(sensor) for sensor in _SENSOR_EVENTS):
+            return
+        # Wake the monitor so it schedules new sensors and picks up any
+        # shortened interval_s right away; a fresh thread starts woken.
+        self._monitor_wake.set()
+        if self._monitor_thread is not None:
+            return
+
+        stop_evt = self._stop_evt
+        wake = self._monitor_wake
+        polls = {
+            "battery": self._poll_battery,
+            "network": self._poll_network,
+            "volume": self._poll_volume,
+        }
+
         def monitor():
             if self.os == "windows":
                 pythoncom.CoInitialize()
             try:
-                last_battery = None
-                last_net = None
-                last_vol_state = None
-                last_mute_state = None
-                while self.running:
-                    # Battery
-                    if self.listeners["battery"]:
-                        try:
-                            batt = psutil.sensors_battery()
-                            if batt and (last_battery != (batt.percent, batt.power_plugged)):
-                                last_battery = (batt.percent, batt.power_plugged)
-                                for cb, _ in self.listeners["battery"]:
-                                    cb(batt.percent, batt.power_plugged)
-                        except Exception as e:
-                            print("Battery error:", e)
-
-                    # Network
-                    if self.listeners["network"]:
-                        try:
-                            net = psutil.net_if_stats()
-                            connected = any(iface.isup for iface in net.values())
-                            if last_net != connected:
-                                last_net = connected
-                                for cb, _ in self.listeners["network"]:
-                                    cb(connected)
-                        except Exception as e:
-                            print("Network error:", e)
-
-                    # Volume
-                    if self.listeners["volume_threshold"] or self.listeners["volume_mute"]:
-                        try:
-                            vol, muted = self._get_system_volume()
-                            if vol is not None:
-                                for cb, params in self.listeners["volume_threshold"]:
-                                    threshold = params.get("threshold", 50)
-                                    if last_vol_state != (vol >= threshold):
-                                        last_vol_state = (vol >= threshold)
-                                        cb(vol)
-                            if muted is not None and muted != last_mute_state:
-                                last_mute_state = muted
-                                for cb, _ in self.listeners["volume_mute"]:
-                                    cb(muted)
-                        except Exception as e:
-                            print("Volume error:", e)
-                    time.sleep(1)
+                # Only sensors with listeners are scheduled: (next_due_ns, sensor).
+                heap: List[Tuple[int, str]] = []
+                last_poll: Dict[str, int] = {}
+                while not stop_evt.is_set():
+                    if wake.is_set():
+                        wake.clear()
+                        heap = self._schedule_sensors(heap, last_poll)
+                    if not heap:
+                        wake.wait()
+                        continue
+                    delay_ns = heap[0][0] - _mono()
+                    if delay_ns > 0:
+                        # Event.wait() is the one place a float is needed.
+                        wake.wait(delay_ns / 1e9)
+                        continue
+                    _, sensor = heapq.heappop(heap)
+                    polls[sensor]()
+                    last_poll[sensor] = now = _mono()
+                    interval_ns = self._poll_interval_ns(sensor)
+                    if interval_ns is not None:
+                        heapq.heappush(heap, (now + interval_ns, sensor))
             finally:
                 if self.os == "windows":
+                    # Drop the COM reference on the apartment that created it.
+                    self._win_volume = None
                     pythoncom.CoUninitialize()
 
-        threading.Thread(target=monitor, daemon=True).start()
+        self._monitor_thread = threading.Thread(target=monitor, daemon=True)
+        self._monitor_thread.start()
+
+    def _sensor_wanted(self, sensor: str) -> bool:
+        """Whether the monitor thread should poll ``sensor``."""
+        return any(self.listeners[event] for event in _SENSOR_EVENTS[sensor])
+
+    def _schedule_sensors(self, heap: List[Tuple[int, str]], last_poll: Dict[str, int]) -> List[Tuple[int, str]]:
+        """Rebuild the monitor's schedule after on() (or a watcher) woke it.
+
+        Newly wanted sensors are due immediately, sensors no longer wanted are
+        dropped, and the rest move earlier if their interval got shorter.
+        Event-driven sensors are never in the heap, so every wake (e.g. from
+        the netlink watcher) polls them once.
+        """
+        now = _mono()
+        due_at = {sensor: due for due, sensor in heap}
+        schedule = []
+        for sensor in _SENSOR_EVENTS:
+            if not self._sensor_wanted(sensor):
+                continue
+            due = due_at.get(sensor, now)
+            interval_ns = self._poll_interval_ns(sensor)
+            if sensor in last_poll and interval_ns is not None:
+                due = min(due, last_poll[sensor] + interval_ns)
+            schedule.append((due, sensor))
+        heapq.heapify(schedule)
+        return schedule
+
+    def _poll_interval_ns(self, sensor: str) -> Optional[int]:
+        """Shortest ``interval_s`` requested by the sensor's listeners, else its default.
+
+        None means the sensor is event-driven and only polled when woken.
+        """
+        if sensor == "network" and self._netlink is not None:
+            return None
+        intervals = [
+            params["interval_s"]
+            for event in _SENSOR_EVENTS[sensor]
+            for _, params in self.listeners[event]
+            if "interval_s" in params
+        ]
+        default = _POLL_INTERVALS[sensor]
+        if sensor == "volume" and self.os != "windows" and self._volume_proc is None:
+            default = _VOLUME_FORK_INTERVAL
+        interval_ns = int(min(intervals, default=default) * 1_000_000_000)
+        return interval_ns << min(self._sensor_failures[sensor], _MAX_BACKOFF_SHIFT)
+
+    def _log_throttled(self, source: str, exc: BaseException) -> None:
+        """Log an error from ``source`` only when the message changes or once a minute."""
+        now = _mono()
+        msg = str(exc)
+        suppressed, last_ns, last_msg = self._log_state.get(source, (0, 0, ""))
+        if msg == last_msg and now - last_ns < _LOG_REPEAT_NS:
+            self._log_state[source] = (suppressed + 1, last_ns, last_msg)
+            return
+        if suppressed:
+            logger.warning("%s error: %s (%d errors suppressed since last report)", source, msg, suppressed)
+        else:
+            logger.warning("%s error: %s", source, msg)
+        self._log_state[source] = (0, now, msg)
+
+    def _sensor_error(self, sensor: str, exc: BaseException) -> None:
+        self._sensor_failures[sensor] += 1
+        self._log_throttled(sensor, exc)
+
+    def _call_listener(self, callback: Callable, *args: Any) -> None:
+        """Run a system-event callback; its errors are the user's, not the sensor's."""
+        try:
+            callback(*args)
+        except Exception:
+            logger.exception("Unhandled exception in event callback")
+
+    def _poll_battery(self) -> None:
+        try:
+            batt = psutil.sensors_battery()
+        except Exception as e:
+            self._sensor_error("battery", e)
+            return
+        self._sensor_failures["battery"] = 0
+        if batt and (self._last_battery != (batt.percent, batt.power_plugged)):
+            self._last_battery = (batt.percent, batt.power_plugged)
+            for cb, _ in self.listeners["battery"]:
+                self._call_listener(cb, batt.percent, batt.power_plugged)
+
+    def _poll_network(self) -> None:
+        try:
+            connected = self._network_connected()
+        except Exception as e:
+            self._sensor_error("network", e)
+            return
+        self._sensor_failures["network"] = 0
+        if self._last_net != connected:
+            self._last_net = connected
+            for cb, _ in self.listeners["network"]:
+                self._call_listener(cb, connected)
+
+    def _poll_volume(self) -> None:
+        if (
+            self._volume_proc is None
+            and self.os in ("darwin", "linux")
+            and _mono() >= self._volume_helper_retry_at
+        ):
+            self._start_volume_helper()
+        try:
+            vol, muted = self._get_system_volume()
+        except Exception as e:
+            self._sensor_error("volume", e)
+            return
+        if vol is None and muted is None:
+            # The backend already logged why; just back off.
+            self._sensor_failures["volume"] += 1
+            return
+        self._sensor_failures["volume"] = 0
+        if vol is not None and vol != self._last_vol:
+            old = self._last_vol
+            self._last_vol = vol
+            keys, entries = self._vol_thresholds
+            if old is None:
+                lo, hi = 0, len(keys)
+            else:
+                # (vol >= T) can only flip for thresholds between the two readings.
+                lo = bisect.bisect_right(keys, min(old, vol))
+                hi = bisect.bisect_right(keys, max(old, vol))
+            for entry in entries[lo:hi]:
+                state = vol >= entry[0]
+                if state != entry[2]:
+                    entry[2] = state
+                    self._call_listener(entry[1], vol)
+        if muted is not None and muted != self._last_mute_state:
+            self._last_mute_state = muted
+            for cb, _ in self.listeners["volume_mute"]:
+                self._call_listener(cb, muted)
+
+    def _start_network_watcher(self) -> bool:
+        """Subscribe to rtnetlink link/address changes instead of polling (Linux only)."""
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        except (AttributeError, OSError):
+            return False
+        try:
+            # Routes are watched too: DHCP usually adds the address before the
+            # default route, and connectivity is judged by the route.
+            sock.bind((0, _RTMGRP_LINK | _RTMGRP_IPV4_IFADDR | _RTMGRP_IPV4_ROUTE
+                       | _RTMGRP_IPV6_IFADDR | _RTMGRP_IPV6_ROUTE))
+        except OSError:
+            sock.close()
+            return False
+        wake_r, wake_w = socket.socketpair()
+        self._netlink_wake = wake_w
+        self._netlink = sock
+
+        def watch():
+            # Only forwards kernel notifications: the monitor thread re-checks
+            # connectivity and runs the network callbacks with the others.
+            try:
+                while True:
+                    # Blocks until the kernel reports a link, address or
+                    # route change, or stop() closes the wake socket.
+                    readable, _, _ = select.select([sock, wake_r], [], [])
+                    if wake_r in readable:
+                        return
+                    sock.recv(65536)
+                    self._monitor_wake.set()
+            except OSError as e:
+                # e.g. ENOBUFS when the receive buffer overran. Unless stop()
+                # already tore this watcher down, resubscribe; if that fails,
+                # the monitor falls back to polling the network.
+                if self._netlink is sock:
+                    self._log_throttled("network", e)
+                    self._netlink = None
+                    self._netlink_wake = None
+                    wake_w.close()
+                    if self.running:
+                        self._start_system_monitors()
+            finally:
+                sock.close()
+                wake_r.close()
+
+        self._netlink_thread = threading.Thread(target=watch, daemon=True)
+        self._netlink_thread.start()
+        return True
+
+    def _network_connected(self) -> bool:
+        """Whether a default route exists, using the cheapest check the OS offers."""
+        if self.os == "linux":
+            try:
+                with open("/proc/net/route", "rb") as f:
+                    next(f, None)  # header
+                    for line in f:
+                        fields = line.split()
+                        if len(fields) > 1 and fields[1] == b"00000000":
+                            return True
+                return self._ipv6_default_route()
+            except OSError:
+                pass
+        elif self.os == "windows":
+            index = c_ulong()
+            return windll.iphlpapi.GetBestInterface(_ROUTE_PROBE_ADDR, byref(index)) == 0
+        net = psutil.net_if_stats()
+        return any(iface.isup for iface in net.values())
+
+    def _ipv6_default_route(self) -> bool:
+        """Whether /proc/net/ipv6_route has a usable ::/0 route (Linux only)."""
+        try:
+            with open("/proc/net/ipv6_route", "rb") as f:
+                for line in f:
+                    # dest, dest_len, src, src_len, next_hop, metric, refcnt, use, flags, iface
+                    fields = line.split()
+                    if (
+                        len(fields) == 10
+                        and fields[0] == _IPV6_ANY
+                        and fields[1] == b"00"
+                        and not int(fields[8], 16) & _RTF_REJECT
+                        and fields[9] != b"lo"
+                    ):
+                        return True
+        except OSError:
+            pass  # IPv6 disabled
+        return False
 
     # -------------------- Cross-Platform Volume --------------------
 
+    def _start_volume_helper(self) -> bool:
+        """Spawn one long-lived helper that reports volume changes (macOS/Linux).
+
+        While it runs, _get_system_volume() just returns the cached state
+        instead of spawning osascript/amixer on every poll.
+        """
+        if self._volume_proc is not None:
+            return True
+        try:
+            if self.os == "darwin":
+                # One synchronous read so polls before the helper's first
+                # line see real values (its loop only logs on change).
+                self._volume_cache = self._get_volume_darwin()
+                proc = subprocess.Popen(
+                    ["osascript", "-e", _OSA_VOLUME_WATCH],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, bufsize=1
+                )
+                stream = proc.stderr
+            elif self.os == "linux":
+                self._volume_cache = self._read_pactl_volume()
+                proc = subprocess.Popen(
+                    ["pactl", "subscribe"],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1
+                )
+                stream = proc.stdout
+            else:
+                return False
+        except (OSError, subprocess.CalledProcessError):
+            self._volume_helper_retry_at = _mono() + _VOLUME_HELPER_RETRY_NS
+            return False
+        self._volume_proc = proc
+
+        def pump():
+            try:
+                for line in stream:
+                    try:
+                        if self.os == "darwin":
+                            vol, _, muted = line.strip().partition(",")
+                            self._volume_cache = (
+                                int(vol) if vol.isdigit() else None,
+                                muted == "true" if muted in ("true", "false") else None
+                            )
+                        # Ignore sink-input/source/client events: only the sinks
+                        # and the server (default sink changes) affect the output.
+                        elif " on sink #" in line or " on server" in line:
+                            self._volume_cache = self._read_pactl_volume()
+                    except Exception as e:
+                        self._log_throttled("volume", e)
+            except (OSError, ValueError):
+                pass  # pipe closed by stop()
+            finally:
+                stream.close()
+                proc.wait()
+                if self._volume_proc is proc:
+                    # The helper died on its own (e.g. the sound server restarted):
+                    # fall back to per-poll reads until _poll_volume restarts it.
+                    self._volume_proc = None
+                    self._volume_helper_retry_at = _mono() + _VOLUME_HELPER_RETRY_NS
+                    self._log_throttled("volume", RuntimeError("volume helper exited"))
+
+        threading.Thread(target=pump, daemon=True).start()
+        return True
+
+    def _read_pactl_volume(self) -> Tuple[Optional[int], Optional[bool]]:
+        vol_out = subprocess.run(
+            ["pactl", "get-sink-volume", "@DEFAULT_SINK@"],
+            capture_output=True, text=True, check=True
+        )
+        mute_out = subprocess.run(
+            ["pactl", "get-sink-mute", "@DEFAULT_SINK@"],
+            capture_output=True, text=True, check=True
+        )
+        match = _PACTL_VOLUME_RE.search(vol_out.stdout)
+        vol = int(match.group(1)) if match else None
+        return vol, mute_out.stdout.strip().lower().endswith("yes")
+
     def _get_system_volume(self) -> Tuple[Optional[int], Optional[bool]]:
-        """Get system volume and mute state depending on OS."""
+        """Get system volume and mute state.
+
+        Unsupported platforms use this stub; __init__ rebinds it to the
+        matching _get_volume_<os> method so polls skip the OS dispatch.
+        """
+        return None, None
+
+    def _get_volume_windows(self) -> Tuple[Optional[int], Optional[bool]]:
         try:
-            if self.os == "windows":
+            if self._win_volume is None:
                 devices = AudioUtilities.GetSpeakers()
                 interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-                volume = cast(interface, POINTER(IAudioEndpointVolume))
+                self._win_volume = cast(interface, POINTER(IAudioEndpointVolume))
+            volume = self._win_volume
+            try:
                 vol = int(volume.GetMasterVolumeLevelScalar() * 100)
                 return vol, bool(volume.GetMute())
+            except Exception:
+                # The default endpoint went away; reactivate on the next poll.
+                self._win_volume = None
+                raise
+        except Exception as e:
+            self._log_throttled("volume", e)
+            return None, None
 
-            elif self.os == "darwin":  # macOS
-                output = subprocess.run(
-                    ["osascript", "-e", "output volume of (get volume settings)"],
-                    capture_output=True, text=True
-                )
-                vol = int(output.stdout.strip()) if output.stdout.strip() else None
-                muted_output = subprocess.run(
-                    ["osascript", "-e", "output muted of (get volume settings)"],
-                    capture_output=True, text=True
-                )
-                muted = muted_output.stdout.strip().lower() == "true"
-                return vol, muted
-
-            elif self.os == "linux":
-                try:
-                    output = subprocess.run(
-                        ["amixer", "get", "Master"],
-                        capture_output=True, text=True
-                    )
-                    vol_line = [line for line in output.stdout.split("\n") if "%" in line]
-                    if vol_line:
-                        vol_str = vol_line[0].split("[")[1].split("%")[0]
-                        muted = "off" in vol_line[0].lower()
-                        return int(vol_str), muted
-                except FileNotFoundError:
-                    return None, None
+    def _get_volume_darwin(self) -> Tuple[Optional[int], Optional[bool]]:
+        if self._volume_proc is not None:
+            return self._volume_cache
+        try:
+            output = subprocess.run(
+                ["osascript", "-e", "output volume of (get volume settings)"],
+                capture_output=True, text=True
+            )
+            vol = int(output.stdout.strip()) if output.stdout.strip() else None
+            muted_output = subprocess.run(
+                ["osascript", "-e", "output muted of (get volume settings)"],
+                capture_output=True, text=True
+            )
+            muted = muted_output.stdout.strip().lower() == "true"
+            return vol, muted
+        except Exception as e:
+            self._log_throttled("volume", e)
+            return None, None
 
+    def _get_volume_linux(self) -> Tuple[Optional[int], Optional[bool]]:
+        if self._volume_proc is not None:
+            return self._volume_cache
+        try:
+            output = subprocess.run(["amixer", "get", "Master"], capture_output=True)
+            match = _AMIXER_RE.search(output.stdout)
+            if match:
+                # No switch field means the control can't be muted.
+                return int(match.group(1)), match.group(2) == b"off"
+            return None, None
+        except FileNotFoundError:
             return None, None
         except Exception as e:
-            print("Volume detection error:", e)
+            self._log_throttled("volume", e)
             return None, None
 
     # -------------------- Start / Stop --------------------
 
     def start(self) -> None:
+        if self.running:
+            return
+        self._join_stale_threads()
         self.running = True
-        self._start_keyboard_listener()
-        self._start_mouse_listener()
-        self._start_system_monitors()
+        self._stop_evt = threading.Event()
+        self._monitor_wake = threading.Event()
+        self._last_battery = None
+        self._last_net = None
+        self._last_vol = None
+        self._last_mute_state = None
+        for entry in self._vol_thresholds[1]:
+            entry[2] = None
+        # Drop input the previous run never dispatched; it is stale now.
+        with self._event_cv:
+            self._event_q.clear()
+        self._start_dispatcher()
+        # Each pynput listener installs its own OS hook and thread, so only
+        # start the ones something is registered for; on() starts the rest.
+        if any(self.listeners[event] for event in _KEYBOARD_EVENTS):
+            self._start_keyboard_listener()
+        if any(self.listeners[event] for event in _MOUSE_EVENTS):
+            self._start_mouse_listener()
+        if any(self.listeners[event] for event in _SYSTEM_EVENTS):
+            self._start_system_monitors()
+
+    def _join_stale_threads(self) -> None:
+        """Wait for the previous run's dispatcher, monitor and netlink threads to exit.
+
+        Their stop token is already set, so this only waits out a callback or
+        poll in progress. A thread restarting KeyNet from one of its own
+        callbacks is skipped; it exits as soon as that callback returns.
+        """
+        current = threading.current_thread()
+        for thread in (self._dispatcher_thread, self._monitor_thread, self._netlink_thread):
+            if thread is not None and thread is not current:
+                thread.join()
+        self._dispatcher_thread = None
+        self._monitor_thread = None
+        self._netlink_thread = None
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Block until stop() is called (e.g. from a callback); returns False on timeout."""
+        return self._stop_evt.wait(timeout)
 
     def stop(self) -> None:
         self.running = False
+        self._stop_evt.set()
+        self._monitor_wake.set()
+        with self._event_cv:
+            self._event_cv.notify_all()
         if self._keyboard_listener:
             self._keyboard_listener.stop()
+            self._keyboard_listener = None
         if self._mouse_listener:
             self._mouse_listener.stop()
+            self._mouse_listener = None
+        if self._netlink_wake:
+            self._netlink_wake.close()
+            self._netlink_wake = None
+            self._netlink = None
+        proc = self._volume_proc
+        if proc:
+            self._volume_proc = None
+            proc.terminate()
+            try:
+                proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+            for pipe in (proc.stdout, proc.stderr):
+                if pipe:
+                    pipe.close()